@@ -1,453 +1,821 @@
-"""
-MAIN.PY - Valida Prospect | Easy Funnel Brasil
-"""
-
-import io
-import re
-import time
-
-import pandas as pd
-import requests
-import streamlit as st
-
-# Tenta importar DNS (para validar domínio de e-mail)
-try:
-    import dns.resolver as dns_resolver
-except ImportError:
-    dns_resolver = None
-
-
-# ==========================================================
-# CONFIG DE IMAGENS (JÁ AJUSTADAS COM SEU REPO)
-# ==========================================================
-BANNER_URL = "https://raw.githubusercontent.com/brunocamargo87-png/valida-prospect/main/banner_easyfunnel.png"
-LOGO_URL   = "https://raw.githubusercontent.com/brunocamargo87-png/valida-prospect/main/easyfunnel.png"
-# LOGO_URL está aqui só se você quiser usar depois; no layout atual usamos só o banner.
-
-
-# ==========================================================
-# Funções de negócio (validação e enriquecimento)
-# ==========================================================
-def email_valido_formato(email: str) -> bool:
-    """Valida o FORMATO básico do e-mail (não garante que ele exista)."""
-    if not isinstance(email, str):
-        return False
-
-    email = email.strip()
-
-    if "@" not in email:
-        return False
-
-    partes = email.split("@")
-    if len(partes) != 2:
-        return False
-
-    usuario, dominio = partes
-
-    if not usuario.strip():
-        return False
-
-    if not dominio.strip():
-        return False
-
-    if "." not in dominio:
-        return False
-
-    if dominio.endswith("."):
-        return False
-
-    return True
-
-
-def extrair_dominio(email: str):
-    """Extrai o domínio (parte depois do @) ou None se não der."""
-    if not isinstance(email, str):
-        return None
-    email = email.strip()
-    if "@" not in email:
-        return None
-    dom = email.split("@")[-1].strip().lower()
-    return dom or None
-
-
-def dominio_existe(dominio: str) -> bool:
-    """
-    Tenta descobrir se o domínio existe via DNS.
-    Primeiro tenta MX (e-mail), depois A (site).
-    Se não tiver dnspython ou der erro, devolve False.
-    """
-    if not isinstance(dominio, str):
-        return False
-
-    dominio = dominio.strip().lower()
-    if not dominio:
-        return False
-
-    if dns_resolver is None:
-        # Sem dnspython não dá pra checar de verdade
-        return False
-
-    try:
-        dns_resolver.resolve(dominio, "MX")
-        return True
-    except Exception:
-        try:
-            dns_resolver.resolve(dominio, "A")
-            return True
-        except Exception:
-            return False
-
-
-def limpar_cnpj(cnpj: str):
-    """Remove tudo que não é dígito e garante 14 dígitos."""
-    if not isinstance(cnpj, str):
-        cnpj = str(cnpj)
-    digitos = re.sub(r"\D", "", cnpj)
-    if len(digitos) != 14:
-        return None
-    return digitos
-
-
-def consultar_cnpj_api(cnpj_limpo: str):
-    """
-    Consulta CNPJ na API pública CNPJ.ws.
-    Atenção: limite de ~3 requisições por minuto no gratuito.
-    """
-    base_url = "https://publica.cnpj.ws/cnpj/"
-
-    try:
-        resp = requests.get(base_url + cnpj_limpo, timeout=10)
-
-        if resp.status_code == 429:
-            # limite estourado
-            return None
-
-        if resp.status_code != 200:
-            return None
-
-        data = resp.json()
-        if not isinstance(data, dict):
-            return None
-
-        estabelecimento = data.get("estabelecimento", {}) or {}
-        if not isinstance(estabelecimento, dict):
-            estabelecimento = {}
-
-        situacao = (
-            estabelecimento.get("situacao_cadastral")
-            or data.get("situacao_cadastral")
-        )
-
-        cnae_principal = estabelecimento.get("atividade_principal") or {}
-        if isinstance(cnae_principal, dict):
-            cnae_codigo = (
-                cnae_principal.get("id")
-                or cnae_principal.get("codigo")
-                or ""
-            )
-            cnae_desc = cnae_principal.get("descricao") or ""
-        else:
-            cnae_codigo = ""
-            cnae_desc = ""
-
-        return {
-            "situacao_cadastral": situacao,
-            "cnae_principal_codigo": cnae_codigo,
-            "cnae_principal_descricao": cnae_desc,
-        }
-
-    except Exception:
-        return None
-
-
-def segmento_macro_por_cnae(cnae_codigo: str) -> str:
-    """Agrupa o CNAE em um segmento macro simplificado."""
-    if not isinstance(cnae_codigo, str):
-        cnae_codigo = str(cnae_codigo or "")
-
-    digitos = re.sub(r"\D", "", cnae_codigo)
-    if len(digitos) < 2:
-        return ""
-
-    sec = int(digitos[:2])
-
-    if 1 <= sec <= 3:
-        return "Agropecuária"
-    if 5 <= sec <= 9:
-        return "Indústrias extrativas"
-    if 10 <= sec <= 33:
-        return "Indústrias de transformação"
-    if sec == 35:
-        return "Eletricidade e gás"
-    if 36 <= sec <= 39:
-        return "Água, esgoto, resíduos"
-    if 41 <= sec <= 43:
-        return "Construção"
-    if 45 <= sec <= 47:
-        return "Comércio / Varejo"
-    if 49 <= sec <= 53:
-        return "Transporte e correio"
-    if 55 <= sec <= 56:
-        return "Alojamento e alimentação"
-    if 58 <= sec <= 63:
-        return "Informação e comunicação"
-    if 64 <= sec <= 66:
-        return "Finanças e seguros"
-    if sec == 68:
-        return "Imobiliário"
-    if 69 <= sec <= 75:
-        return "Serviços profissionais"
-    if 77 <= sec <= 82:
-        return "Serviços administrativos"
-    if sec == 84:
-        return "Administração pública"
-    if sec == 85:
-        return "Educação"
-    if 86 <= sec <= 88:
-        return "Saúde e assistência social"
-    if 90 <= sec <= 93:
-        return "Artes, esporte e recreação"
-    if 94 <= sec <= 96:
-        return "Outros serviços"
-    if 97 <= sec <= 98:
-        return "Serviços domésticos"
-    if sec == 99:
-        return "Organismos internacionais"
-
-    return ""
-
-
-def enriquecer_dataframe(df: pd.DataFrame, col_email: str, col_cnpj: str) -> pd.DataFrame:
-    """Aplica todas as validações/enriquecimentos na base."""
-
-    st.write("▶️ Iniciando enriquecimento da base...")
-
-    # 1) Validação de formato de e-mail
-    st.write("📧 Validando formato dos e-mails...")
-    df["email_valido_formato"] = df[col_email].apply(email_valido_formato)
-
-    # 2) Validação de domínio de e-mail
-    st.write("🌐 Checando se domínio dos e-mails existe...")
-    dominio_cache = {}
-
-    def checar_dominio_email(email):
-        dom = extrair_dominio(email)
-        if not dom:
-            return False
-        if dom in dominio_cache:
-            return dominio_cache[dom]
-        ok = dominio_existe(dom)
-        dominio_cache[dom] = ok
-        return ok
-
-    df["dominio_existe"] = df[col_email].apply(checar_dominio_email)
-
-    # 3) Consulta de CNPJ com gotejamento + cache em memória
-    st.write("🏢 Consultando CNPJ na API pública (gotejamento, pode demorar)...")
-
-    cnpj_cache = {}
-    chamadas_api_no_ciclo = 0
-    max_chamadas_por_ciclo = 3
-    tempo_espera = 65  # segundos entre blocos
-
-    resultados = []
-
-    for idx, cnpj in enumerate(df[col_cnpj].tolist()):
-        cnpj_limpo = limpar_cnpj(cnpj)
-        if not cnpj_limpo:
-            resultados.append(
-                {
-                    "cnpj_situacao_cadastral": None,
-                    "cnae_principal_codigo": None,
-                    "cnae_principal_descricao": None,
-                    "segmento_macro": None,
-                }
-            )
-            continue
-
-        if cnpj_limpo not in cnpj_cache:
-            if chamadas_api_no_ciclo >= max_chamadas_por_ciclo:
-                st.write("⏳ Limite de consultas atingido. Aguardando alguns segundos...")
-                time.sleep(tempo_espera)
-                chamadas_api_no_ciclo = 0
-
-            info = consultar_cnpj_api(cnpj_limpo)
-            cnpj_cache[cnpj_limpo] = info
-            chamadas_api_no_ciclo += 1
-        else:
-            info = cnpj_cache[cnpj_limpo]
-
-        if not info:
-            resultados.append(
-                {
-                    "cnpj_situacao_cadastral": None,
-                    "cnae_principal_codigo": None,
-                    "cnae_principal_descricao": None,
-                    "segmento_macro": None,
-                }
-            )
-        else:
-            seg = segmento_macro_por_cnae(info.get("cnae_principal_codigo") or "")
-            resultados.append(
-                {
-                    "cnpj_situacao_cadastral": info.get("situacao_cadastral"),
-                    "cnae_principal_codigo": info.get("cnae_principal_codigo"),
-                    "cnae_principal_descricao": info.get("cnae_principal_descricao"),
-                    "segmento_macro": seg,
-                }
-            )
-
-    enriquecido_df = pd.DataFrame(resultados)
-    df_final = pd.concat([df.reset_index(drop=True), enriquecido_df], axis=1)
-
-    return df_final
-
-
-# ==========================================================
-# App Streamlit (frontend estilizado)
-# ==========================================================
-def main():
-    st.set_page_config(
-        page_title="Valida Prospect – Easy Funnel",
-        layout="wide",
-    )
-
-    # ===== CSS customizado (hero + ajustes visuais) =====
-    st.markdown(
-        """
-        <style>
-        .block-container {
-            padding-top: 0rem;
-            max-width: 1200px;
-        }
-        .hero-wrapper {
-            margin-top: 0.8rem;
-            margin-bottom: 1.8rem;
-        }
-        .hero-image {
-            width: 100%;
-            border-radius: 16px;
-            display: block;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
-
-    # ===== HERO: banner inteiro, sem corte =====
-    st.markdown(
-        f"""
-        <div class="hero-wrapper">
-            <img src="{BANNER_URL}" class="hero-image" />
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
-
-    # ===== Texto de apoio =====
-    st.write(
-        """
-        **Como funciona:**
-        1. Envie um arquivo com colunas de **Empresa, CNPJ e E-mail** (CSV com `;` ou Excel).  
-        2. Mapeie as colunas corretas (caso os nomes sejam diferentes).  
-        3. O Valida Prospect enriquece a base com:  
-           - ✅ Validação de formato de e-mail  
-           - ✅ Checagem de domínio via DNS  
-           - ✅ Consulta de CNPJ em API pública  
-           - ✅ Classificação por segmento macro (CNAE)  
-        """
-    )
-
-    # ===== Upload do arquivo =====
-    uploaded_file = st.file_uploader(
-        "Envie seu arquivo de clientes",
-        type=["csv", "xlsx"],
-    )
-
-    if not uploaded_file:
-        st.info("👆 Envie um arquivo para começar.")
-        return
-
-    # Detectar tipo do arquivo
-    if uploaded_file.name.lower().endswith(".csv"):
-        # Supondo separador ; como padrão Brasil
-        df = pd.read_csv(uploaded_file, sep=";")
-    else:
-        df = pd.read_excel(uploaded_file)
-
-    st.subheader("Pré-visualização da base enviada")
-    st.dataframe(df.head())
-
-    # Seleção das colunas de e-mail e CNPJ (flexível)
-    st.subheader("Mapeamento de colunas")
-
-    colunas = list(df.columns)
-
-    col_email = st.selectbox(
-        "Coluna de e-mail",
-        colunas,
-        index=colunas.index("Email") if "Email" in colunas else 0,
-    )
-    col_cnpj = st.selectbox(
-        "Coluna de CNPJ",
-        colunas,
-        index=colunas.index("CNPJ") if "CNPJ" in colunas else 0,
-    )
-
-    if st.button("🚀 Processar base"):
-        df_enriquecido = enriquecer_dataframe(df, col_email, col_cnpj)
-
-        st.subheader("Base enriquecida (primeiras linhas)")
-        st.dataframe(df_enriquecido.head())
-
-        # KPIs simples
-        st.subheader("📌 Indicadores rápidos")
-        col_kpi1, col_kpi2, col_kpi3 = st.columns(3)
-
-        total = len(df_enriquecido)
-        valid_email = df_enriquecido["email_valido_formato"].sum() if "email_valido_formato" in df_enriquecido else 0
-        dominio_ok = df_enriquecido["dominio_existe"].sum() if "dominio_existe" in df_enriquecido else 0
-
-        with col_kpi1:
-            st.metric("Total de registros", total)
-
-        with col_kpi2:
-            perc_email = (valid_email / total * 100) if total > 0 else 0
-            st.metric("E-mails com formato válido", f"{valid_email} ({perc_email:.1f}%)")
-
-        with col_kpi3:
-            perc_dom = (dominio_ok / total * 100) if total > 0 else 0
-            st.metric("Domínios existentes (DNS)", f"{dominio_ok} ({perc_dom:.1f}%)")
-
-        # Visualizações simples
-        st.subheader("📊 Visualizações rápidas")
-
-        if "segmento_macro" in df_enriquecido.columns:
-            seg_counts = df_enriquecido["segmento_macro"].value_counts(dropna=True)
-            if not seg_counts.empty:
-                st.write("Distribuição por segmento macro:")
-                st.bar_chart(seg_counts)
-
-        if "cnpj_situacao_cadastral" in df_enriquecido.columns:
-            sit_counts = df_enriquecido["cnpj_situacao_cadastral"].value_counts(
-                dropna=True
-            )
-            if not sit_counts.empty:
-                st.write("Situação cadastral dos CNPJs:")
-                st.bar_chart(sit_counts)
-
-        # Gerar arquivo Excel para download
-        buffer = io.BytesIO()
-        df_enriquecido.to_excel(buffer, index=False)
-        buffer.seek(0)
-
-        st.download_button(
-            label="⬇️ Baixar base enriquecida (Excel)",
-            data=buffer,
-            file_name="base_enriquecida.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-
-
-if __name__ == "__main__":
-    main()
+"""
+MAIN.PY - Valida Prospect | Easy Funnel Brasil
+"""
+
+import asyncio
+import io
+import os
+import re
+import sqlite3
+import time
+
+import httpx
+import numpy as np
+import orjson
+import pandas as pd
+import streamlit as st
+from aiolimiter import AsyncLimiter
+from cachetools import TTLCache
+
+# Tenta importar DNS (para validar domínio de e-mail)
+try:
+    import dns.asyncresolver as dns_asyncresolver
+    import dns.resolver as dns_resolver
+except ImportError:
+    dns_asyncresolver = None
+    dns_resolver = None
+
+# Resolvers compartilhados: evitam reler /etc/resolv.conf a cada
+# consulta e guardam respostas recentes num LRU interno do dnspython.
+if dns_resolver is not None:
+    RESOLVER = dns_resolver.Resolver()
+    RESOLVER.lifetime = 2.0
+    RESOLVER.cache = dns_resolver.LRUCache(10_000)
+
+    RESOLVER_ASYNC = dns_asyncresolver.Resolver()
+    RESOLVER_ASYNC.lifetime = 2.0
+    RESOLVER_ASYNC.cache = dns_resolver.LRUCache(10_000)
+else:
+    RESOLVER = None
+    RESOLVER_ASYNC = None
+
+# Quantas consultas DNS em voo ao mesmo tempo
+DNS_MAX_CONCORRENCIA = 64
+
+# Dois caches de DNS com limite de tamanho e de idade: positivos valem
+# 24h; negativos só 1h, porque um domínio que falhou (NXDOMAIN, timeout
+# passageiro) pode voltar a resolver logo — igual a um resolver real,
+# que usa TTL curto para respostas negativas.
+DNS_CACHE_POS = TTLCache(maxsize=50_000, ttl=86400)
+DNS_CACHE_NEG = TTLCache(maxsize=50_000, ttl=3600)
+
+
+# Persistência do cache de DNS entre execuções: os poucos domínios
+# que dominam qualquer lista (gmail etc.) não são re-resolvidos a
+# cada processo novo. Cada entrada guarda o timestamp da resolução,
+# então os TTLs (24h/1h) continuam valendo através do disco.
+DNS_CACHE_FILE = "dns_cache.json"
+_DNS_TS = {}
+
+
+def _dns_cache_get(dominio):
+    """True/False se o domínio é conhecido; None se precisa resolver."""
+    if dominio in DNS_CACHE_POS:
+        return True
+    if dominio in DNS_CACHE_NEG:
+        return False
+    return None
+
+
+def _dns_cache_set(dominio, ok: bool, ts: float = None) -> None:
+    if ok:
+        DNS_CACHE_POS[dominio] = True
+    else:
+        DNS_CACHE_NEG[dominio] = False
+    _DNS_TS[dominio] = ts if ts is not None else time.time()
+
+
+def _carregar_dns_cache() -> None:
+    """Reidrata os caches de DNS a partir do disco (se houver)."""
+    try:
+        with open(DNS_CACHE_FILE, "rb") as f:
+            dados = orjson.loads(f.read())
+    except Exception:
+        return
+    if not isinstance(dados, dict):
+        return
+
+    agora = time.time()
+    for dominio, entrada in dados.items():
+        try:
+            ok = bool(entrada["ok"])
+            ts = float(entrada["ts"])
+        except Exception:
+            continue
+        ttl = DNS_CACHE_POS.ttl if ok else DNS_CACHE_NEG.ttl
+        if agora - ts < ttl:
+            _dns_cache_set(dominio, ok, ts=ts)
+
+
+def _salvar_dns_cache() -> None:
+    """Grava os dois caches num JSON só, de forma atômica."""
+    try:
+        agora = time.time()
+        dados = {}
+        for cache in (DNS_CACHE_POS, DNS_CACHE_NEG):
+            for dominio, ok in cache.items():
+                dados[dominio] = {
+                    "ok": ok,
+                    "ts": _DNS_TS.get(dominio, agora),
+                }
+        tmp = DNS_CACHE_FILE + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(dados))
+        os.replace(tmp, DNS_CACHE_FILE)
+    except Exception:
+        # cache é só otimização; não pode derrubar o processamento
+        pass
+
+
+_carregar_dns_cache()
+
+
+# ==========================================================
+# CONFIG DE IMAGENS (JÁ AJUSTADAS COM SEU REPO)
+# ==========================================================
+BANNER_URL = "https://raw.githubusercontent.com/brunocamargo87-png/valida-prospect/main/banner_easyfunnel.png"
+LOGO_URL   = "https://raw.githubusercontent.com/brunocamargo87-png/valida-prospect/main/easyfunnel.png"
+# LOGO_URL está aqui só se você quiser usar depois; no layout atual usamos só o banner.
+
+
+# ==========================================================
+# Regexes compiladas uma vez só (evita custo por linha)
+# ==========================================================
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s.]+$")
+_NON_DIGIT_RE = re.compile(r"\D")
+
+
+# ==========================================================
+# Funções de negócio (validação e enriquecimento)
+# ==========================================================
+def email_valido_formato(email: str) -> bool:
+    """Valida o FORMATO básico do e-mail (não garante que ele exista)."""
+    if not isinstance(email, str):
+        return False
+    return bool(EMAIL_RE.match(email.strip()))
+
+
+def extrair_dominio(email: str):
+    """Extrai o domínio (parte depois do @) ou None se não der."""
+    if not isinstance(email, str):
+        return None
+    email = email.strip()
+    if "@" not in email:
+        return None
+    dom = email.split("@")[-1].strip().lower()
+    return dom or None
+
+
+def dominio_existe(dominio: str) -> bool:
+    """
+    Tenta descobrir se o domínio existe via DNS.
+    Primeiro tenta MX (e-mail), depois A (site).
+    Se não tiver dnspython ou der erro, devolve False.
+
+    O resultado fica nos caches de DNS (compartilhados com o caminho
+    assíncrono em lote): 24h quando existe, 1h quando não.
+    """
+    if not isinstance(dominio, str):
+        return False
+
+    dominio = dominio.strip().lower()
+    if not dominio:
+        return False
+
+    hit = _dns_cache_get(dominio)
+    if hit is not None:
+        return hit
+
+    if RESOLVER is None:
+        # Sem dnspython não dá pra checar de verdade
+        return False
+
+    try:
+        RESOLVER.resolve(dominio, "MX")
+        ok = True
+    except Exception:
+        try:
+            RESOLVER.resolve(dominio, "A")
+            ok = True
+        except Exception:
+            ok = False
+
+    _dns_cache_set(dominio, ok)
+    return ok
+
+
+async def _dominio_existe_async(dominio: str) -> bool:
+    """MX e A disparados juntos; basta um dos dois responder."""
+    mx, a = await asyncio.gather(
+        RESOLVER_ASYNC.resolve(dominio, "MX"),
+        RESOLVER_ASYNC.resolve(dominio, "A"),
+        return_exceptions=True,
+    )
+    return not (isinstance(mx, Exception) and isinstance(a, Exception))
+
+
+def checar_dominios(dominios) -> dict:
+    """
+    Resolve vários domínios de uma vez e devolve {dominio: existe?}.
+
+    Cada domínio dispara MX e A em paralelo (em vez de MX e só depois
+    A como fallback), e os domínios entre si também andam juntos,
+    limitados por um semáforo.
+    """
+    dominios = list(dominios)
+    if RESOLVER_ASYNC is None or not dominios:
+        return {d: False for d in dominios}
+
+    # Só vai pra rede quem não está em nenhum dos dois caches —
+    # dedup aqui dentro também, caso o chamador passe repetidos.
+    pendentes = list(
+        dict.fromkeys(d for d in dominios if _dns_cache_get(d) is None)
+    )
+
+    if pendentes:
+
+        async def _todos():
+            sem = asyncio.Semaphore(DNS_MAX_CONCORRENCIA)
+
+            async def _um(d):
+                async with sem:
+                    return await _dominio_existe_async(d)
+
+            return await asyncio.gather(*[_um(d) for d in pendentes])
+
+        for dom, ok in zip(pendentes, asyncio.run(_todos())):
+            _dns_cache_set(dom, ok)
+
+        _salvar_dns_cache()
+
+    return {d: _dns_cache_get(d) or False for d in dominios}
+
+
+def limpar_cnpj(cnpj: str):
+    """Remove tudo que não é dígito e garante 14 dígitos."""
+    if not isinstance(cnpj, str):
+        cnpj = str(cnpj)
+
+    cnpj = cnpj.strip()
+
+    # Caminho rápido: a maioria das bases já traz 14 dígitos puros,
+    # e str.isdigit() é bem mais barato que passar pela regex.
+    if len(cnpj) == 14 and cnpj.isdigit():
+        return cnpj
+
+    digitos = _NON_DIGIT_RE.sub("", cnpj)
+    if len(digitos) != 14:
+        return None
+    return digitos
+
+
+def limpar_cnpj_serie(serie: pd.Series) -> pd.Series:
+    """
+    Versão vetorizada de limpar_cnpj para a coluna inteira: uma
+    passada de regex em C e a máscara de 14 dígitos, sem chamada
+    Python por linha. Entradas inválidas viram None.
+    """
+    digitos = serie.astype(str).str.replace(_NON_DIGIT_RE, "", regex=True)
+    return digitos.where(digitos.str.len().eq(14), None)
+
+
+CNPJ_WS_URL = "https://publica.cnpj.ws/cnpj/"
+
+# Cache de CNPJ por CNPJ (não por lote): numa base nova que repete
+# CNPJs de bases antigas, só os inéditos passam pelo rate limit.
+# Fica em SQLite guardando só os 3 campos consumidos: abrir é uma
+# consulta (sem re-parsear JSON no boot) e cada fetch vira um
+# INSERT OR REPLACE durável na hora.
+CNPJ_CACHE_FILE = "cnpj_cache.sqlite3"
+
+# Validade das linhas do cache (via fetched_at): dados de CNPJ valem
+# 24h (situação cadastral muda), e consultas que falharam valem só 1h
+# — mesmo racional dos TTLs positivo/negativo do DNS.
+CNPJ_TTL_OK = 86400
+CNPJ_TTL_FALHA = 3600
+
+
+def _abrir_cnpj_db():
+    conn = sqlite3.connect(CNPJ_CACHE_FILE, check_same_thread=False)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS cache (
+            cnpj TEXT PRIMARY KEY,
+            situacao TEXT,
+            cnae_codigo TEXT,
+            cnae_desc TEXT,
+            fetched_at INTEGER
+        )
+        """
+    )
+    return conn
+
+
+_CNPJ_DB = _abrir_cnpj_db()
+
+
+def _carregar_cnpj_cache() -> dict:
+    """
+    Carrega o cache de CNPJs de execuções anteriores (uma query).
+
+    Linhas vencidas (pelo fetched_at) ficam de fora: o CNPJ volta a
+    ser consultado e o INSERT OR REPLACE renova a linha no banco.
+    """
+    cache = {}
+    agora = time.time()
+    try:
+        linhas = _CNPJ_DB.execute(
+            "SELECT cnpj, situacao, cnae_codigo, cnae_desc, fetched_at"
+            " FROM cache"
+        )
+        for cnpj, situacao, cnae_codigo, cnae_desc, fetched_at in linhas:
+            falhou = situacao is None and not cnae_codigo
+            ttl = CNPJ_TTL_FALHA if falhou else CNPJ_TTL_OK
+            if fetched_at is None or agora - fetched_at >= ttl:
+                continue
+            if falhou:
+                # consulta que falhou há pouco; segue como "sem info"
+                cache[cnpj] = None
+            else:
+                cache[cnpj] = {
+                    "situacao_cadastral": situacao,
+                    "cnae_principal_codigo": cnae_codigo,
+                    "cnae_principal_descricao": cnae_desc,
+                }
+    except Exception:
+        pass
+    return cache
+
+
+def _gravar_cnpj_cache(cnpj_limpo: str, info) -> None:
+    """Grava uma consulta no SQLite (durável sem regravar o resto)."""
+    try:
+        info = info or {}
+        _CNPJ_DB.execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+            (
+                cnpj_limpo,
+                info.get("situacao_cadastral"),
+                info.get("cnae_principal_codigo"),
+                info.get("cnae_principal_descricao"),
+                int(time.time()),
+            ),
+        )
+        _CNPJ_DB.commit()
+    except Exception:
+        # cache é só otimização; não pode derrubar o processamento
+        pass
+
+
+_CNPJ_CACHE = _carregar_cnpj_cache()
+
+
+def _montar_info_cnpj(data):
+    """Extrai do JSON da CNPJ.ws só os campos que usamos."""
+    if not isinstance(data, dict):
+        return None
+
+    estabelecimento = data.get("estabelecimento", {}) or {}
+    if not isinstance(estabelecimento, dict):
+        estabelecimento = {}
+
+    situacao = (
+        estabelecimento.get("situacao_cadastral")
+        or data.get("situacao_cadastral")
+    )
+
+    cnae_principal = estabelecimento.get("atividade_principal") or {}
+    if isinstance(cnae_principal, dict):
+        cnae_codigo = (
+            cnae_principal.get("id")
+            or cnae_principal.get("codigo")
+            or ""
+        )
+        cnae_desc = cnae_principal.get("descricao") or ""
+    else:
+        cnae_codigo = ""
+        cnae_desc = ""
+
+    return {
+        "situacao_cadastral": situacao,
+        "cnae_principal_codigo": cnae_codigo,
+        "cnae_principal_descricao": cnae_desc,
+    }
+
+
+# Status que valem nova tentativa (rate limit e erros transitórios)
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+async def _consultar_cnpj_async(client, limiter, cnpj_limpo, tentativas=3):
+    """
+    Uma consulta de CNPJ respeitando o limitador compartilhado.
+
+    429/5xx e erros de rede ganham nova tentativa com backoff
+    exponencial, honrando o header Retry-After quando a API manda um.
+    """
+    for tentativa in range(tentativas):
+        async with limiter:
+            try:
+                resp = await client.get(CNPJ_WS_URL + cnpj_limpo)
+            except Exception:
+                resp = None
+
+        if resp is not None and resp.status_code == 200:
+            try:
+                # orjson direto nos bytes: sem sniff de encoding nem
+                # str intermediária do resp.json() padrão
+                data = orjson.loads(resp.content)
+            except Exception:
+                return None
+            return _montar_info_cnpj(data)
+
+        if resp is not None and resp.status_code not in _RETRY_STATUS:
+            return None
+
+        if tentativa + 1 < tentativas:
+            espera = 2 ** tentativa
+            if resp is not None:
+                retry_after = resp.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    espera = max(espera, int(retry_after))
+            await asyncio.sleep(espera)
+
+    return None
+
+
+def consultar_cnpjs_api(cnpjs) -> dict:
+    """
+    Consulta vários CNPJs na API pública CNPJ.ws e devolve {cnpj: info}.
+
+    O plano gratuito permite ~3 requisições por minuto. Em vez de um
+    time.sleep(65) entre blocos, um AsyncLimiter(3, 60) agenda as
+    requisições: elas se sobrepõem (conexão keep-alive/HTTP2 reusada)
+    e o resto do pipeline não fica parado num sleep.
+
+    Só CNPJs fora do _CNPJ_CACHE passam pelo limitador: com cache
+    quente a função devolve tudo na hora, sem esperar janela nenhuma.
+    """
+    cnpjs = list(cnpjs)
+    # Dedup aqui dentro também: cada CNPJ distinto vai pra rede no
+    # máximo uma vez, mesmo que o chamador passe repetidos.
+    pendentes = list(
+        dict.fromkeys(c for c in cnpjs if c not in _CNPJ_CACHE)
+    )
+
+    if pendentes:
+
+        async def _buscar_todos():
+            limiter = AsyncLimiter(3, 60)
+            # Além do balde de 3/min, no máximo 3 requisições em voo:
+            # respostas lentas não acumulam conexões penduradas.
+            sem = asyncio.Semaphore(3)
+
+            async def _uma(c):
+                async with sem:
+                    info = await _consultar_cnpj_async(client, limiter, c)
+                # Persiste conforme as respostas chegam: um crash no
+                # meio do lote não perde nada que já foi consultado.
+                _CNPJ_CACHE[c] = info
+                _gravar_cnpj_cache(c, info)
+                return info
+
+            # Poucas conexões keep-alive bastam (3 req/min): o handshake
+            # TCP+TLS é pago uma vez e reaproveitado o lote inteiro.
+            limites = httpx.Limits(
+                max_connections=4, max_keepalive_connections=4
+            )
+            async with httpx.AsyncClient(
+                http2=True, timeout=10, limits=limites
+            ) as client:
+                return await asyncio.gather(*[_uma(c) for c in pendentes])
+
+        asyncio.run(_buscar_todos())
+
+    return {c: _CNPJ_CACHE.get(c) for c in cnpjs}
+
+
+# Tabela seção CNAE (2 primeiros dígitos) -> segmento macro.
+# Montada uma vez no import; consulta vira um acesso O(1) por índice.
+SEG_TABLE = np.full(100, "", dtype=object)
+_FAIXAS_SEGMENTO = (
+    (1, 3, "Agropecuária"),
+    (5, 9, "Indústrias extrativas"),
+    (10, 33, "Indústrias de transformação"),
+    (35, 35, "Eletricidade e gás"),
+    (36, 39, "Água, esgoto, resíduos"),
+    (41, 43, "Construção"),
+    (45, 47, "Comércio / Varejo"),
+    (49, 53, "Transporte e correio"),
+    (55, 56, "Alojamento e alimentação"),
+    (58, 63, "Informação e comunicação"),
+    (64, 66, "Finanças e seguros"),
+    (68, 68, "Imobiliário"),
+    (69, 75, "Serviços profissionais"),
+    (77, 82, "Serviços administrativos"),
+    (84, 84, "Administração pública"),
+    (85, 85, "Educação"),
+    (86, 88, "Saúde e assistência social"),
+    (90, 93, "Artes, esporte e recreação"),
+    (94, 96, "Outros serviços"),
+    (97, 98, "Serviços domésticos"),
+    (99, 99, "Organismos internacionais"),
+)
+for _ini, _fim, _nome in _FAIXAS_SEGMENTO:
+    SEG_TABLE[_ini:_fim + 1] = _nome
+
+
+def segmento_macro_por_cnae(cnae_codigo: str) -> str:
+    """Agrupa o CNAE em um segmento macro simplificado."""
+    if not isinstance(cnae_codigo, str):
+        cnae_codigo = str(cnae_codigo or "")
+
+    digitos = _NON_DIGIT_RE.sub("", cnae_codigo)
+    if len(digitos) < 2:
+        return ""
+
+    return SEG_TABLE[int(digitos[:2])]
+
+
+def segmento_macro_serie(cnae_serie: pd.Series) -> np.ndarray:
+    """
+    Versão vetorizada de segmento_macro_por_cnae: extrai a seção
+    (2 primeiros dígitos) da coluna inteira e faz um único gather na
+    SEG_TABLE. Linhas sem CNAE viram None.
+    """
+    codigos = cnae_serie.astype("string")
+    secoes = pd.to_numeric(
+        codigos.str.extract(r"^\D*(\d{2})", expand=False), errors="coerce"
+    )
+    return np.where(
+        secoes.isna().to_numpy(),
+        None,
+        SEG_TABLE[secoes.fillna(0).astype(int).to_numpy()],
+    )
+
+
+@st.cache_data(show_spinner=False)
+def carregar_base(nome_arquivo: str, conteudo: bytes) -> pd.DataFrame:
+    """
+    Lê o arquivo enviado (CSV com ; ou Excel) para um DataFrame.
+
+    Cacheado pelos bytes do upload: trocar coluna no selectbox ou
+    clicar no botão re-executa o script, mas não re-parseia o arquivo.
+    """
+    bio = io.BytesIO(conteudo)
+    if nome_arquivo.lower().endswith(".csv"):
+        # Supondo separador ; como padrão Brasil.
+        # Parser do PyArrow: nativo, paralelo, e strings ficam em
+        # arrays Arrow (bem mais leves que colunas object).
+        return pd.read_csv(
+            bio, sep=";", engine="pyarrow", dtype_backend="pyarrow"
+        )
+    # calamine (Rust) lê .xlsx bem mais rápido que openpyxl
+    return pd.read_excel(bio, engine="calamine")
+
+
+def enriquecer_dataframe(df: pd.DataFrame, col_email: str, col_cnpj: str) -> pd.DataFrame:
+    """Aplica todas as validações/enriquecimentos na base."""
+
+    with st.status("Enriquecendo a base...", expanded=True) as status:
+        barra = st.progress(0.0)
+        ultimo_tick = [0.0]
+
+        def _progresso(fracao):
+            # No máximo ~2 atualizações por segundo: cada .progress()
+            # vira uma mensagem no websocket do Streamlit.
+            agora = time.monotonic()
+            if fracao >= 1.0 or agora - ultimo_tick[0] >= 0.5:
+                barra.progress(fracao)
+                ultimo_tick[0] = agora
+
+        # 1) Validação de formato de e-mail (vetorizada, uma passada em C na coluna toda)
+        st.write("📧 Validando formato dos e-mails...")
+        emails = df[col_email].astype("string").str.strip()
+        df["email_valido_formato"] = emails.str.match(EMAIL_RE).fillna(False).astype(bool)
+        _progresso(0.25)
+
+        # 2) Validação de domínio de e-mail
+        st.write("🌐 Checando se domínio dos e-mails existe...")
+
+        # Extração do domínio vetorizada (uma passada em C na coluna),
+        # em vez de chamar extrair_dominio() linha a linha.
+        dominios = (
+            df[col_email]
+            .astype("string")
+            .str.strip()
+            .str.lower()
+            .str.extract(r"@([^@\s]+)$", expand=False)
+        )
+
+        # Checa cada domínio único uma vez, em paralelo (DNS é só espera
+        # de rede), e mapeia o resultado de volta nas linhas.
+        dominios_unicos = dominios.dropna().unique()
+
+        resultado_dns = checar_dominios(dominios_unicos)
+        df["dominio_existe"] = dominios.map(resultado_dns).fillna(False).astype(bool)
+        _progresso(0.5)
+
+        # 3) Consulta de CNPJ (máx. 3 req/min na API gratuita)
+        st.write("🏢 Consultando CNPJ na API pública (3 req/min, pode demorar)...")
+
+        # Limpeza vetorizada: uma passada só na coluna inteira,
+        # em vez de chamar limpar_cnpj() linha a linha.
+        cnpj_series = limpar_cnpj_serie(df[col_cnpj])
+
+        # Cada CNPJ único vai na API uma vez só; depois o resultado
+        # é mapeado de volta para todas as linhas.
+        cnpjs_unicos = cnpj_series.dropna().unique()
+        info_por_cnpj = consultar_cnpjs_api(cnpjs_unicos)
+        _progresso(0.9)
+
+        # Expansão vetorizada: monta um DataFrame só com os CNPJs
+        # únicos (uma passada de from_dict) e mapeia cada coluna de
+        # volta pelas linhas, em vez de N cadeias de dict.get por linha.
+        colunas_info = (
+            "situacao_cadastral",
+            "cnae_principal_codigo",
+            "cnae_principal_descricao",
+        )
+        info_df = pd.DataFrame.from_dict(
+            {c: i for c, i in info_por_cnpj.items() if isinstance(i, dict)},
+            orient="index",
+        )
+        if info_df.empty:
+            info_df = pd.DataFrame(columns=colunas_info)
+
+        # Atribuição direta das colunas novas: o pd.concat(axis=1)
+        # copiaria todas as colunas da base original só pra anexar essas.
+        df["cnpj_situacao_cadastral"] = cnpj_series.map(
+            info_df["situacao_cadastral"]
+        )
+        df["cnae_principal_codigo"] = cnpj_series.map(
+            info_df["cnae_principal_codigo"]
+        )
+        df["cnae_principal_descricao"] = cnpj_series.map(
+            info_df["cnae_principal_descricao"]
+        )
+
+        # Segmento macro 100% vetorizado (um gather na SEG_TABLE)
+        df["segmento_macro"] = segmento_macro_serie(
+            df["cnae_principal_codigo"]
+        )
+        _progresso(1.0)
+
+        status.update(label="Enriquecimento concluído ✅", state="complete")
+
+    return df
+
+
+# ==========================================================
+# App Streamlit (frontend estilizado)
+# ==========================================================
+def main():
+    st.set_page_config(
+        page_title="Valida Prospect – Easy Funnel",
+        layout="wide",
+    )
+
+    # ===== CSS customizado (hero + ajustes visuais) =====
+    st.markdown(
+        """
+        <style>
+        .block-container {
+            padding-top: 0rem;
+            max-width: 1200px;
+        }
+        .hero-wrapper {
+            margin-top: 0.8rem;
+            margin-bottom: 1.8rem;
+        }
+        .hero-image {
+            width: 100%;
+            border-radius: 16px;
+            display: block;
+        }
+        </style>
+        """,
+        unsafe_allow_html=True,
+    )
+
+    # ===== HERO: banner inteiro, sem corte =====
+    st.markdown(
+        f"""
+        <div class="hero-wrapper">
+            <img src="{BANNER_URL}" class="hero-image" />
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+    # ===== Texto de apoio =====
+    st.write(
+        """
+        **Como funciona:**
+        1. Envie um arquivo com colunas de **Empresa, CNPJ e E-mail** (CSV com `;` ou Excel).  
+        2. Mapeie as colunas corretas (caso os nomes sejam diferentes).  
+        3. O Valida Prospect enriquece a base com:  
+           - ✅ Validação de formato de e-mail  
+           - ✅ Checagem de domínio via DNS  
+           - ✅ Consulta de CNPJ em API pública  
+           - ✅ Classificação por segmento macro (CNAE)  
+        """
+    )
+
+    # ===== Upload do arquivo =====
+    uploaded_file = st.file_uploader(
+        "Envie seu arquivo de clientes",
+        type=["csv", "xlsx"],
+    )
+
+    if not uploaded_file:
+        st.info("👆 Envie um arquivo para começar.")
+        return
+
+    # Parse cacheado: só a primeira interação paga a leitura
+    df = carregar_base(uploaded_file.name, uploaded_file.getvalue())
+
+    st.subheader("Pré-visualização da base enviada")
+    st.dataframe(df.head())
+
+    # Seleção das colunas de e-mail e CNPJ (flexível)
+    st.subheader("Mapeamento de colunas")
+
+    colunas = list(df.columns)
+
+    col_email = st.selectbox(
+        "Coluna de e-mail",
+        colunas,
+        index=colunas.index("Email") if "Email" in colunas else 0,
+    )
+    col_cnpj = st.selectbox(
+        "Coluna de CNPJ",
+        colunas,
+        index=colunas.index("CNPJ") if "CNPJ" in colunas else 0,
+    )
+
+    if st.button("🚀 Processar base"):
+        df_enriquecido = enriquecer_dataframe(df, col_email, col_cnpj)
+
+        st.subheader("Base enriquecida (primeiras linhas)")
+        st.dataframe(df_enriquecido.head())
+
+        # KPIs simples
+        st.subheader("📌 Indicadores rápidos")
+        col_kpi1, col_kpi2, col_kpi3 = st.columns(3)
+
+        total = len(df_enriquecido)
+        valid_email = df_enriquecido["email_valido_formato"].sum() if "email_valido_formato" in df_enriquecido else 0
+        dominio_ok = df_enriquecido["dominio_existe"].sum() if "dominio_existe" in df_enriquecido else 0
+
+        with col_kpi1:
+            st.metric("Total de registros", total)
+
+        with col_kpi2:
+            perc_email = (valid_email / total * 100) if total > 0 else 0
+            st.metric("E-mails com formato válido", f"{valid_email} ({perc_email:.1f}%)")
+
+        with col_kpi3:
+            perc_dom = (dominio_ok / total * 100) if total > 0 else 0
+            st.metric("Domínios existentes (DNS)", f"{dominio_ok} ({perc_dom:.1f}%)")
+
+        # Visualizações simples
+        st.subheader("📊 Visualizações rápidas")
+
+        if "segmento_macro" in df_enriquecido.columns:
+            seg_counts = df_enriquecido["segmento_macro"].value_counts(dropna=True)
+            if not seg_counts.empty:
+                st.write("Distribuição por segmento macro:")
+                st.bar_chart(seg_counts)
+
+        if "cnpj_situacao_cadastral" in df_enriquecido.columns:
+            sit_counts = df_enriquecido["cnpj_situacao_cadastral"].value_counts(
+                dropna=True
+            )
+            if not sit_counts.empty:
+                st.write("Situação cadastral dos CNPJs:")
+                st.bar_chart(sit_counts)
+
+        # Gerar arquivo Excel para download.
+        # xlsxwriter escreve bem mais rápido que o openpyxl padrão.
+        # Atenção: sem constant_memory — o to_excel do pandas escreve
+        # coluna a coluna, e o modo constant_memory descarta em
+        # silêncio células de linhas já "fechadas", corrompendo tudo
+        # menos a primeira coluna.
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+            df_enriquecido.to_excel(writer, index=False)
+        buffer.seek(0)
+
+        st.download_button(
+            label="⬇️ Baixar base enriquecida (Excel)",
+            data=buffer,
+            file_name="base_enriquecida.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+
+        # Parquet: bem menor e mais rápido que XLSX, pra quem vai
+        # consumir a base programaticamente (pandas, BI etc.)
+        parquet_buffer = io.BytesIO()
+        df_enriquecido.to_parquet(parquet_buffer, index=False)
+
+        st.download_button(
+            label="⬇️ Baixar base enriquecida (Parquet)",
+            data=parquet_buffer.getvalue(),
+            file_name="base_enriquecida.parquet",
+            mime="application/octet-stream",
+        )
+
+
+if __name__ == "__main__":
+    main()